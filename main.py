@@ -8,60 +8,199 @@ Optimizado para archivos largos (6+ horas)
 import os
 import sys
 import json
+import subprocess
+import tempfile
+import threading
 import vlc
+from bisect import bisect_left, bisect_right
 import numpy as np
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Optional, Tuple, Dict
-from PyQt6.QtCore import Qt, QTimer, QSettings, QRect, QSize, pyqtSignal
-from PyQt6.QtGui import QPainter, QPen, QPainterPath
+from functools import lru_cache, partial
+from typing import Callable, List, Optional, Tuple, Dict
+from PyQt6.QtCore import (
+    Qt, QTimer, QSettings, QRect, QSize, QObject, QRunnable, QThreadPool, pyqtSignal
+)
+from PyQt6.QtGui import QPainter, QPen, QPolygon
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QSlider, QFileDialog, QScrollArea, 
     QListWidget, QListWidgetItem, QSplitter, QLineEdit, QMessageBox
 )
 
-from pydub import AudioSegment
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from tsdownsample import MinMaxDownsampler
+except ImportError:
+    MinMaxDownsampler = None
 
 # Constantes y funciones auxiliares
 MARKERS_SUFFIX = ".markers.json"
+PCM_SAMPLE_RATE = 22050
+PCM_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'audinux')
+WFCACHE_SUFFIX = ".wfcache.npz"
+# Muestras PCM por punto en cada nivel de la pirámide; cada nivel es múltiplo del anterior
+PYRAMID_STRIDES = (256, 1024, 4096, 16384)
+
+# Teclas de los atajos como enteros, resueltas una sola vez al cargar el módulo
+(_K_SPACE, _K_S, _K_PLUS, _K_EQUAL, _K_Z, _K_MINUS, _K_UNDERSCORE, _K_X, _K_M, _K_L,
+ _K_PERIOD, _K_COMMA, _K_LEFT, _K_RIGHT, _K_O, _K_P, _K_UP, _K_DOWN) = (
+    Qt.Key.Key_Space.value, Qt.Key.Key_S.value, Qt.Key.Key_Plus.value,
+    Qt.Key.Key_Equal.value, Qt.Key.Key_Z.value, Qt.Key.Key_Minus.value,
+    Qt.Key.Key_Underscore.value, Qt.Key.Key_X.value, Qt.Key.Key_M.value,
+    Qt.Key.Key_L.value, Qt.Key.Key_Period.value, Qt.Key.Key_Comma.value,
+    Qt.Key.Key_Left.value, Qt.Key.Key_Right.value, Qt.Key.Key_O.value,
+    Qt.Key.Key_P.value, Qt.Key.Key_Up.value, Qt.Key.Key_Down.value,
+)
+# Teclas multimedia de zoom (algunos teclados y ratones las envían)
+_K_ZOOM_IN, _K_ZOOM_OUT = Qt.Key.Key_ZoomIn.value, Qt.Key.Key_ZoomOut.value
+# Teclas con atajo propio: si la combinación no coincide no se reenvían a Qt
+_HANDLED_KEYS = frozenset({
+    _K_SPACE, _K_S, _K_PLUS, _K_EQUAL, _K_Z, _K_MINUS, _K_UNDERSCORE, _K_X, _K_M, _K_L,
+    _K_PERIOD, _K_COMMA, _K_LEFT, _K_RIGHT, _K_O, _K_P, _K_UP, _K_DOWN,
+    _K_ZOOM_IN, _K_ZOOM_OUT,
+})
+
+# Modificadores de teclado como enteros (los flags de PyQt6 no son IntFlag)
+_CTRL = Qt.KeyboardModifier.ControlModifier.value
+_SHIFT = Qt.KeyboardModifier.ShiftModifier.value
+_ALT = Qt.KeyboardModifier.AltModifier.value
+# Solo se consideran Ctrl, Shift y Alt; Keypad, Meta, etc. se descartan al entrar
+_MOD_MASK = _CTRL | _SHIFT | _ALT
+# Paso de ←/→ en ms por índice de modificadores (bit 0 = Ctrl, bit 1 = Shift; Ctrl tiene prioridad)
+_SEEK_DELTAS = (5000, 30000, 1000, 30000)
 
 def markers_path_for(audio_path: str) -> str:
     return f"{audio_path}{MARKERS_SUFFIX}"
 
+def wfcache_path_for(audio_path: str) -> str:
+    return f"{audio_path}{WFCACHE_SUFFIX}"
+
 def load_json(path: str, default):
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw.decode('utf-8'))
     except Exception:
         return default
 
 def save_json(path: str, data) -> bool:
     try:
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Salida compacta; orjson (si está instalado) es bastante más rápido que json
+        if orjson is not None:
+            raw = orjson.dumps(data)
+        else:
+            raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(raw)
         return True
     except Exception:
         return False
 
-def fmt_ms(ms: int) -> str:
-    total_seconds = int(ms // 1000)
-    ms_part = int(ms % 1000)
-    h = total_seconds // 3600
-    m = (total_seconds % 3600) // 60
-    s = total_seconds % 60
+@lru_cache(maxsize=4096)
+def _fmt_s(total_seconds: int) -> str:
+    h, rem = divmod(total_seconds, 3600)
+    m, s = divmod(rem, 60)
     if h:
         return f"{h:02d}:{m:02d}:{s:02d}"
     return f"{m:02d}:{s:02d}"
 
+def fmt_ms(ms: int) -> str:
+    # El formato no muestra milisegundos: se cachea por segundo entero
+    return _fmt_s(int(ms) // 1000)
+
+@lru_cache(maxsize=None)
+def _envelope_kernel() -> Optional[Callable]:
+    """
+    Núcleo Numba para minmax_envelope, o None si numba no está instalado.
+    Se importa y compila al primer uso para no alargar el arranque cuando
+    tsdownsample está disponible y el núcleo nunca se llega a usar.
+    """
+    try:
+        from numba import njit, prange
+    except ImportError:
+        return None
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def kernel(arr, bucket, mins, maxs):
+        # Una sola pasada por bucket, en paralelo y sin arrays temporales
+        for b in prange(len(mins)):
+            base = b * bucket
+            lo = arr[base]
+            hi = lo
+            for j in range(1, bucket):
+                v = arr[base + j]
+                if v < lo:
+                    lo = v
+                elif v > hi:
+                    hi = v
+            mins[b] = lo
+            maxs[b] = hi
+    return kernel
+
+def probe_audio(path: str) -> Tuple[int, int]:
+    """Leer frecuencia de muestreo y duración (ms) con ffprobe, sin decodificar el audio"""
+    out = subprocess.check_output([
+        'ffprobe', '-v', 'error', '-select_streams', 'a:0',
+        '-show_entries', 'stream=sample_rate:format=duration', '-of', 'json', path
+    ], stdin=subprocess.DEVNULL)
+    info = json.loads(out)
+    streams = info.get('streams') or [{}]
+    sample_rate = int(streams[0].get('sample_rate') or 0)
+    duration_ms = int(float(info.get('format', {}).get('duration') or 0) * 1000)
+    return sample_rate, duration_ms
+
+def minmax_envelope(arr: np.ndarray, bucket_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Calcular el mínimo y máximo de cada bucket (la cola incompleta se descarta)"""
+    n_buckets = len(arr) // max(1, bucket_size)
+    if n_buckets == 0:
+        return arr[:0], arr[:0]
+    trimmed = arr[:n_buckets * bucket_size]
+
+    if MinMaxDownsampler is not None and bucket_size > 2:
+        # Núcleo SIMD de tsdownsample: una sola pasada, sin copias intermedias.
+        # Devuelve los índices de min y max de cada bucket en orden temporal.
+        idx = MinMaxDownsampler().downsample(np.asarray(trimmed), n_out=2 * n_buckets)
+        out = trimmed[idx]
+        first, second = out[0::2], out[1::2]
+        return np.minimum(first, second), np.maximum(first, second)
+
+    kernel = _envelope_kernel()
+    if kernel is not None:
+        mins = np.empty(n_buckets, dtype=arr.dtype)
+        maxs = np.empty(n_buckets, dtype=arr.dtype)
+        kernel(np.asarray(trimmed), bucket_size, mins, maxs)
+        return mins, maxs
+
+    reshaped = trimmed.reshape(-1, bucket_size)
+    return reshaped.min(axis=1), reshaped.max(axis=1)
+
 # Clase para manejo de configuraciones
 class AppSettings:
     def __init__(self):
         self.s = QSettings("Audinux", "AudinuxPlayer")
+        # Copia en memoria para no consultar el backend de QSettings en cada acceso
+        self._cache = {
+            'last_dir': self.s.value('last_dir', '', type=str),
+            'last_rate': self.s.value('last_rate', 1.0, type=float),
+            'zoom': self.s.value('zoom', 1.0, type=float),
+        }
 
     def get(self, key: str, default=None):
-        return self.s.value(key, default)
+        if key not in self._cache:
+            self._cache[key] = self.s.value(key, default)
+        return self._cache[key]
 
     def set(self, key: str, value):
+        if key in self._cache and self._cache[key] == value:
+            return
+        self._cache[key] = value
         self.s.setValue(key, value)
 
     def last_dir(self) -> str:
@@ -71,13 +210,13 @@ class AppSettings:
         self.set('last_dir', path)
 
     def last_rate(self) -> float:
-        return float(self.get('last_rate', 1.0))
+        return self.get('last_rate', 1.0)
 
     def set_last_rate(self, r: float):
         self.set('last_rate', r)
 
     def zoom_level(self) -> float:
-        return float(self.get('zoom', 1.0))
+        return self.get('zoom', 1.0)
 
     def set_zoom_level(self, z: float):
         self.set('zoom', z)
@@ -90,52 +229,91 @@ class Marker:
 
 class MarkersManager:
     def __init__(self):
-        self._markers: List[Marker] = []
+        # Listas paralelas ordenadas por tiempo; Marker solo se usa como vista.
+        # Las búsquedas puntuales usan bisect sobre _ms, sin el coste de llamar a NumPy
+        self._ms: List[int] = []
+        self._names: List[str] = []
         self._audio_path: Optional[str] = None
+        # Cambios pendientes de guardar; se escriben agrupados con flush()
+        self._dirty = False
         self.loop_enabled = False
         self.loop_start: Optional[int] = None
         self.loop_end: Optional[int] = None
 
     def load_for(self, audio_path: str):
+        if audio_path == self._audio_path:
+            return
+        # Guardar lo pendiente del archivo anterior antes de cambiar de ruta
+        self.flush()
         self._audio_path = audio_path
         data = load_json(markers_path_for(audio_path), [])
-        self._markers = [Marker(m.get('name', ''), int(m.get('ms', 0))) for m in data]
+        entries = sorted(((int(m.get('ms', 0)), m.get('name', '')) for m in data), key=lambda e: e[0])
+        self._ms = [ms for ms, _ in entries]
+        self._names = [name for _, name in entries]
 
     def save(self):
         if not self._audio_path:
             return False
-        data = [m.__dict__ for m in self._markers]
+        data = [{'name': n, 'ms': m} for n, m in zip(self._names, self._ms)]
         return save_json(markers_path_for(self._audio_path), data)
 
+    def flush(self) -> bool:
+        """Escribir los marcadores solo si hay cambios pendientes"""
+        if not self._dirty:
+            return True
+        self._dirty = False
+        return self.save()
+
+    def _schedule_save(self):
+        if not self._dirty:
+            self._dirty = True
+            QTimer.singleShot(500, self.flush)
+
     def add_marker(self, position_ms: int, name: str):
-        self._markers.append(Marker(name=name, ms=int(position_ms)))
-        self._markers.sort(key=lambda m: m.ms)
-        self.save()
+        ms = int(position_ms)
+        i = bisect_right(self._ms, ms)
+        self._ms.insert(i, ms)
+        self._names.insert(i, name)
+        self._schedule_save()
 
     def list(self) -> List[Marker]:
-        return list(self._markers)
+        return [Marker(name=n, ms=m) for n, m in zip(self._names, self._ms)]
 
     def clear(self):
-        self._markers.clear()
-        self.save()
-
-    def nearest_before(self, ms: int) -> Optional[Marker]:
-        prev = [m for m in self._markers if m.ms < ms]
-        return prev[-1] if prev else None
-
-    def nearest_after(self, ms: int) -> Optional[Marker]:
-        nxt = [m for m in self._markers if m.ms > ms]
-        return nxt[0] if nxt else None
+        self._ms.clear()
+        self._names.clear()
+        self._schedule_save()
+
+    def ms_at(self, i: int) -> int:
+        return self._ms[i]
+
+    def index_before(self, ms: int, hint: Optional[int] = None) -> Optional[int]:
+        """Índice del último marcador anterior a ms; hint es un candidato que se verifica en O(1)"""
+        pos = self._ms
+        if hint is not None and 0 <= hint < len(pos):
+            if pos[hint] < ms and (hint + 1 == len(pos) or pos[hint + 1] >= ms):
+                return hint
+        i = bisect_left(pos, ms)
+        return i - 1 if i > 0 else None
+
+    def index_after(self, ms: int, hint: Optional[int] = None) -> Optional[int]:
+        """Índice del primer marcador posterior a ms; hint es un candidato que se verifica en O(1)"""
+        pos = self._ms
+        if hint is not None and 0 <= hint < len(pos):
+            if pos[hint] > ms and (hint == 0 or pos[hint - 1] <= ms):
+                return hint
+        i = bisect_right(pos, ms)
+        return i if i < len(pos) else None
 
     def set_loop(self, start_ms: Optional[int], end_ms: Optional[int]):
-        self.loop_start = start_ms
-        self.loop_end = end_ms
+        self.loop_start = None if start_ms is None else int(start_ms)
+        self.loop_end = None if end_ms is None else int(end_ms)
         self.loop_enabled = start_ms is not None and end_ms is not None and start_ms < end_ms
 
     def should_loop(self, current_ms: int) -> Optional[int]:
-        if self.loop_enabled and self.loop_start is not None and self.loop_end is not None:
-            if current_ms >= self.loop_end:
-                return int(self.loop_start)
+        # set_loop solo activa loop_enabled con ambos extremos definidos
+        if self.loop_enabled and current_ms >= self.loop_end:
+            return self.loop_start
         return None
 
 # Clase para manejo de listas de reproducción
@@ -186,6 +364,8 @@ class AudioProcessor:
         self.audio_path: Optional[str] = None
         self.duration_ms: int = 0
         self.sample_rate: int = 0
+        self.pcm_rate: int = PCM_SAMPLE_RATE
+        self.pyramid: List[Tuple[np.ndarray, np.ndarray]] = []
         
         # Establecer volumen inicial
         self.player.audio_set_volume(70)
@@ -205,39 +385,123 @@ class AudioProcessor:
         print("Error en reproducción de audio")
         self.is_ready = False
         
-    # En clase AudioProcessor añadido:
-    def precompute_waveform(self, resolution_per_second=50):
+    def build_waveform_data(
+        self, file_path: str,
+        on_process: Optional[Callable[[subprocess.Popen], None]] = None
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
         """
-        Precargar toda la forma de onda en memoria.
-        resolution_per_second = cantidad de puntos por segundo de audio.
+        Preparar la pirámide de waveform de un archivo a partir de un PCM temporal.
+        No modifica el estado del procesador, así que puede ejecutarse en un hilo aparte
+        (también varias veces a la vez); el resultado se aplica con set_waveform_data().
+        on_process recibe el proceso de ffmpeg para poder cancelarlo desde fuera.
         """
-        if not self.audio_path or not os.path.exists(self.audio_path):
-            self.waveform_cache = (np.array([]), np.array([]))
-            return
+        stamp = self._pyramid_stamp(file_path)
+        pyramid = self._load_cached_pyramid(file_path, stamp)
+        if pyramid:
+            # La pirámide guardada sigue siendo válida: no hace falta transcodificar
+            return pyramid
         
+        # Cada construcción usa su propio archivo: dos cargas solapadas del mismo
+        # audio no comparten ni pisan el PCM de la otra
+        os.makedirs(PCM_CACHE_DIR, exist_ok=True)
+        fd, pcm_path = tempfile.mkstemp(dir=PCM_CACHE_DIR, suffix='.pcm')
+        os.close(fd)
+        pcm = None
+        try:
+            pcm = self._decode_pcm(file_path, pcm_path, on_process)
+            return self._build_pyramid(file_path, pcm, stamp)
+        finally:
+            # El PCM solo sirve para construir la pirámide; no se conserva en disco
+            del pcm
+            try:
+                os.remove(pcm_path)
+            except OSError:
+                pass
+
+    def set_waveform_data(self, pyramid: List[Tuple[np.ndarray, np.ndarray]]):
+        self.pyramid = pyramid
+
+    def _pyramid_stamp(self, file_path: str) -> np.ndarray:
+        """Identificador de la versión del archivo con la que se calculó la pirámide"""
+        st = os.stat(file_path)
+        return np.array([st.st_size, int(st.st_mtime), self.pcm_rate], dtype=np.int64)
+
+    def _load_cached_pyramid(self, file_path: str, stamp: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Leer la pirámide guardada junto al audio si corresponde al mismo archivo"""
+        cache_path = wfcache_path_for(file_path)
         try:
-            seg = AudioSegment.from_file(self.audio_path)
-            mono = seg.set_channels(1)
-            arr = np.array(mono.get_array_of_samples()).astype(np.float32)
-            max_val = float(1 << (8 * mono.sample_width - 1))
-            arr /= max_val
-
-            samples_per_second = mono.frame_rate
-            bucket_size = int(samples_per_second / resolution_per_second)
-            if bucket_size < 1:
-                bucket_size = 1
-
-            trimmed_len = len(arr) - (len(arr) % bucket_size)
-            reshaped = arr[:trimmed_len].reshape(-1, bucket_size)
-            mins = reshaped.min(axis=1)
-            maxs = reshaped.max(axis=1)
-
-            self.waveform_cache = (mins, maxs)
-            self.waveform_resolution = resolution_per_second
-            print(f"Waveform precalculado: {len(mins)} puntos")
+            with np.load(cache_path) as data:
+                if np.array_equal(data['stamp'], stamp):
+                    print(f"Pirámide de waveform cargada desde {cache_path}")
+                    return [
+                        (data[f'mins{i}'], data[f'maxs{i}'])
+                        for i in range(len(PYRAMID_STRIDES))
+                    ]
+        except Exception:
+            pass
+        return []
+
+    def _build_pyramid(self, file_path: str, pcm: Optional[np.ndarray], stamp: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Precalcular envelopes min/max a varias resoluciones (PYRAMID_STRIDES)
+        y guardarlos junto al audio para reutilizarlos en la próxima carga.
+        """
+        cache_path = wfcache_path_for(file_path)
+        if pcm is None or len(pcm) == 0:
+            return []
+        
+        try:
+            # El primer nivel sale del PCM; los siguientes se reducen desde el anterior
+            mins, maxs = minmax_envelope(pcm, PYRAMID_STRIDES[0])
+            levels = [(mins, maxs)]
+            for prev_stride, stride in zip(PYRAMID_STRIDES, PYRAMID_STRIDES[1:]):
+                factor = stride // prev_stride
+                n = len(mins) // factor
+                mins = mins[:n * factor].reshape(-1, factor).min(axis=1)
+                maxs = maxs[:n * factor].reshape(-1, factor).max(axis=1)
+                levels.append((mins, maxs))
+            print(f"Pirámide de waveform calculada: {len(levels[0][0])} puntos en el nivel base")
         except Exception as e:
-            print(f"Error precalculando waveform: {e}")
-            self.waveform_cache = (np.array([]), np.array([]))
+            print(f"Error calculando pirámide de waveform: {e}")
+            return []
+        
+        tmp_path = None
+        try:
+            arrays = {'stamp': stamp}
+            for i, (lo, hi) in enumerate(levels):
+                arrays[f'mins{i}'] = lo
+                arrays[f'maxs{i}'] = hi
+            # Escribir a un nombre temporal y sustituir de golpe: nunca queda un .npz a medias
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(cache_path) or '.',
+                prefix=os.path.basename(cache_path) + '.', suffix='.part'
+            )
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"No se pudo guardar la pirámide de waveform: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        return levels
+
+    def get_envelope(self, start_ms: int, end_ms: int, resolution: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Obtener el envelope (int16) de un tramo desde el nivel de pirámide adecuado"""
+        if not self.pyramid or end_ms <= start_ms:
+            return np.array([], dtype=np.int16), np.array([], dtype=np.int16)
+        
+        i0 = start_ms * self.pcm_rate // 1000
+        i1 = end_ms * self.pcm_rate // 1000
+        samples_per_pixel = (i1 - i0) / max(1, resolution)
+        
+        # Nivel más grueso que todavía da al menos un punto por píxel
+        lvl = max(0, bisect_right(PYRAMID_STRIDES, samples_per_pixel) - 1)
+        stride = PYRAMID_STRIDES[lvl]
+        mins, maxs = self.pyramid[lvl]
+        return mins[i0 // stride:i1 // stride], maxs[i0 // stride:i1 // stride]
 
     def load_audio(self, file_path: str):
         if not os.path.exists(file_path):
@@ -245,6 +509,7 @@ class AudioProcessor:
         
         print(f"Cargando archivo: {file_path}")
         self.audio_path = file_path
+        self.pyramid = []
         self.media = self.instance.media_new_path(file_path)
         
         # Asegurar que el time-stretch esté habilitado
@@ -255,74 +520,60 @@ class AudioProcessor:
         # Parsear el medio para obtener metadatos
         self.media.parse_with_options(vlc.MediaParseFlag.local, 0)
         
+        # Cargar información básica del audio (solo cabeceras)
+        probed_duration_ms = self._load_audio_info(file_path)
+        
         # Obtener duración
         dur = self.media.get_duration()
         if dur and dur > 0:
             self.duration_ms = int(dur)
             print(f"Duración detectada: {self.duration_ms} ms")
         else:
-            # Fallback con pydub
-            seg = AudioSegment.from_file(file_path)
-            self.duration_ms = len(seg)
+            # Fallback con ffprobe
+            self.duration_ms = probed_duration_ms
             print(f"Duración fallback: {self.duration_ms} ms")
         
-        # Cargar información básica del audio
-        self._load_audio_info(file_path)
-        
         # Marcar como listo
         self.is_ready = True
         print("Audio cargado correctamente")
 
-    def _load_audio_info(self, file_path: str):
+    def _load_audio_info(self, file_path: str) -> int:
+        """Leer los metadatos con ffprobe; devuelve la duración en ms (0 si falla)"""
         try:
-            seg: AudioSegment = AudioSegment.from_file(file_path)
-            self.sample_rate = seg.frame_rate
+            self.sample_rate, duration_ms = probe_audio(file_path)
             print(f"Información de audio cargada: {self.sample_rate} Hz")
+            return duration_ms
         except Exception as e:
             print(f"Error al cargar información de audio: {e}")
             self.sample_rate = 44100  # Valor por defecto
+            return 0
 
-    def get_waveform_segment(self, start_ms: int, end_ms: int, resolution: int) -> Tuple[np.ndarray, np.ndarray]:
-        """Obtener un segmento de la forma de onda con la resolución especificada"""
-        if not self.audio_path or not os.path.exists(self.audio_path):
-            return np.array([]), np.array([])
-            
+    def _decode_pcm(
+        self, file_path: str, pcm_path: str,
+        on_process: Optional[Callable[[subprocess.Popen], None]] = None
+    ) -> Optional[np.ndarray]:
+        """Transcodificar el archivo a PCM int16 mono en pcm_path y mapearlo en memoria"""
         try:
-            # Cargar solo el segmento necesario
-            seg = AudioSegment.from_file(self.audio_path)[start_ms:end_ms]
-            mono = seg.set_channels(1)
+            proc = subprocess.Popen([
+                'ffmpeg', '-nostdin', '-v', 'quiet', '-y', '-i', file_path,
+                '-ac', '1', '-ar', str(self.pcm_rate), '-f', 's16le', pcm_path
+            ], stdin=subprocess.DEVNULL)
+            if on_process:
+                on_process(proc)
+            returncode = proc.wait()
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, 'ffmpeg')
             
-            # Convertir a numpy array
-            arr = np.array(mono.get_array_of_samples()).astype(np.float32)
-            max_val = float(1 << (8 * mono.sample_width - 1))
-            arr = arr / max_val
-            
-            # Calcular envelope con la resolución especificada
-            if len(arr) == 0:
-                return np.array([]), np.array([])
-                
-            if len(arr) <= resolution:
-                # Si el segmento es más pequeño que la resolución, devolver todos los puntos
-                return arr, arr
-            
-            # Calcular el tamaño de cada bucket
-            bucket_size = len(arr) // resolution
-            if bucket_size < 1:
-                bucket_size = 1
-                
-            # Ajustar la longitud para que sea divisible por bucket_size
-            trimmed_len = len(arr) - (len(arr) % bucket_size)
-            trimmed = arr[:trimmed_len]
-            
-            # Reshape y calcular min/max
-            reshaped = trimmed.reshape(-1, bucket_size)
-            mins = reshaped.min(axis=1)
-            maxs = reshaped.max(axis=1)
-            
-            return mins, maxs
+            # np.memmap no admite archivos vacíos
+            if os.path.getsize(pcm_path) == 0:
+                pcm = np.zeros(0, dtype=np.int16)
+            else:
+                pcm = np.memmap(pcm_path, dtype=np.int16, mode='r')
+            print(f"Caché PCM lista: {len(pcm)} muestras a {self.pcm_rate} Hz")
+            return pcm
         except Exception as e:
-            print(f"Error al obtener segmento de waveform: {e}")
-            return np.array([]), np.array([])
+            print(f"Error al transcodificar a PCM: {e}")
+            return None
 
     def play(self):
         if not self.is_ready:
@@ -373,6 +624,49 @@ class AudioProcessor:
         self.player.audio_set_volume(vol)
         print(f"Volumen establecido en: {vol}%")
 
+# Construcción de la forma de onda en segundo plano
+class WaveformBuilderSignals(QObject):
+    # (generación, ruta, pirámide)
+    finished = pyqtSignal(object)
+
+class WaveformBuilder(QRunnable):
+    """Prepara la pirámide en el QThreadPool sin bloquear la interfaz"""
+    def __init__(self, processor: AudioProcessor, path: str, generation: int):
+        super().__init__()
+        self.processor = processor
+        self.path = path
+        # Identifica la petición: solo se aplica el resultado de la más reciente
+        self.generation = generation
+        self.signals = WaveformBuilderSignals()
+        # Proceso de ffmpeg en curso; cancel() puede llegar desde el hilo de la interfaz
+        self._lock = threading.Lock()
+        self._proc: Optional[subprocess.Popen] = None
+        self._cancelled = False
+
+    def cancel(self):
+        """Abandonar la construcción y terminar ffmpeg si está transcodificando"""
+        with self._lock:
+            self._cancelled = True
+            if self._proc is not None and self._proc.poll() is None:
+                self._proc.terminate()
+
+    def _attach_process(self, proc: subprocess.Popen):
+        with self._lock:
+            self._proc = proc
+            if self._cancelled:
+                proc.terminate()
+
+    def run(self):
+        if self._cancelled:
+            return
+        try:
+            pyramid = self.processor.build_waveform_data(self.path, self._attach_process)
+        except Exception as e:
+            print(f"Error preparando la forma de onda: {e}")
+            pyramid = []
+        if not self._cancelled:
+            self.signals.finished.emit((self.generation, self.path, pyramid))
+
 # Widget para visualización de forma de onda optimizado
 class WaveformWidget(QWidget):
     def __init__(self, parent=None):
@@ -383,11 +677,16 @@ class WaveformWidget(QWidget):
         self.line_spacing = 12
         self.playhead_ms = 0
         self.zoom_level = 1.0
+        self._pending_zoom = 0
+        self._zoom_scheduled = False
         self.visible_lines = 0
         self.total_lines = 0
         self.time_per_line = 0
-        self.line_cache: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
-        self.line_time_info: Dict[int, Dict[str, str]] = {}
+        # Caché LRU de envelopes int16 por línea, acotada por _line_cache_limit()
+        self.line_cache: "OrderedDict[int, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        # Inicio y fin (ms) de cada línea; los textos se formatean solo al dibujar
+        self._line_starts: np.ndarray = np.empty(0, dtype=np.int64)
+        self._line_ends: np.ndarray = np.empty(0, dtype=np.int64)
         
         # Temporizador para actualizar el playhead
         self._timer = QTimer(self)
@@ -396,20 +695,72 @@ class WaveformWidget(QWidget):
         
         # Proveedor de posición actual
         self._position_provider = None
+        # Destino de los clics de búsqueda; por defecto va directo al procesador
+        self._seek_handler: Optional[Callable[[int], None]] = None
+        # Plumas reutilizadas en cada paintEvent
+        self._pen_time = QPen(Qt.GlobalColor.black)
+        self._pen_axis = QPen(Qt.GlobalColor.gray)
+        self._pen_wave = QPen(Qt.GlobalColor.darkCyan)
+        self._pen_playhead = QPen(Qt.GlobalColor.red)
+        
+        # True mientras la pirámide se construye en segundo plano
+        self.loading = False
+        
+        # Última posición dibujada del playhead como (línea, x)
+        self._last_playhead_px: Optional[Tuple[int, int]] = None
 
     def set_audio_processor(self, processor: AudioProcessor):
         self.audio_processor = processor
         self._calculate_layout()
         self.update()
 
+    def set_loading(self, loading: bool):
+        self.loading = loading
+        self.line_cache.clear()
+        self.update()
+
     def set_position_provider(self, provider):
         self._position_provider = provider
         self._timer.start()
 
+    def set_seek_handler(self, handler: Callable[[int], None]):
+        self._seek_handler = handler
+
     def _update_playhead(self):
         if self._position_provider:
-            self.playhead_ms = self._position_provider()
-            self.update()
+            self.set_playhead_ms(self._position_provider())
+
+    def set_playhead_ms(self, ms: int):
+        self.playhead_ms = ms
+        px = self._playhead_to_px(ms)
+        # Repintar solo si el playhead cambió de columna, y solo su franja
+        if px == self._last_playhead_px:
+            return
+        if self._last_playhead_px is not None:
+            self.update(self._playhead_rect(self._last_playhead_px))
+        if px is not None:
+            self.update(self._playhead_rect(px))
+        self._last_playhead_px = px
+
+    def _playhead_to_px(self, ms: int) -> Optional[Tuple[int, int]]:
+        """Calcular la línea y la columna X del playhead"""
+        if self.time_per_line <= 0 or self.total_lines <= 0:
+            return None
+        line_idx = min(max(0, ms) // self.time_per_line, self.total_lines - 1)
+        line_start = line_idx * self.time_per_line
+        line_duration = min(line_start + self.time_per_line, self.duration_ms) - line_start
+        if line_duration <= 0:
+            return None
+        axis_x = 100
+        axis_width = max(1, self.width() - axis_x - 10)
+        position_in_line = min(1.0, (ms - line_start) / line_duration)
+        return line_idx, axis_x + int(position_in_line * axis_width)
+
+    def _playhead_rect(self, px: Tuple[int, int]) -> QRect:
+        """Franja vertical que ocupa el playhead en su línea"""
+        line_idx, x = px
+        y = line_idx * (self.line_height + self.line_spacing)
+        return QRect(x - 1, y, 3, self.line_height + 1)
 
     def _calculate_layout(self):
         if not self.audio_processor or self.audio_processor.duration_ms <= 0:
@@ -433,37 +784,59 @@ class WaveformWidget(QWidget):
         
         # Limpiar caché
         self.line_cache.clear()
-        self.line_time_info.clear()
-        
-        # Precalcular información de tiempo para cada línea
-        for i in range(self.total_lines):
-            start_ms = i * self.time_per_line
-            end_ms = min((i + 1) * self.time_per_line, self.duration_ms)
-            self.line_time_info[i] = {
-                'start': fmt_ms(start_ms),
-                'end': fmt_ms(end_ms),
-                'start_ms': start_ms,
-                'end_ms': end_ms
-            }
+        self._last_playhead_px = None
+        
+        # Límites de tiempo de cada línea
+        starts = np.arange(self.total_lines, dtype=np.int64) * self.time_per_line
+        self._line_starts = starts
+        self._line_ends = np.minimum(starts + self.time_per_line, self.duration_ms)
         
         # Establecer tamaño mínimo del widget
         min_height = self.total_lines * (self.line_height + self.line_spacing)
         self.setMinimumHeight(min_height)
 
-    def zoom_in(self):
-        self.zoom_level = min(10.0, self.zoom_level * 1.5)
+    def _step_zoom(self, steps: int):
+        """Aplicar pasos de zoom de 1.5x (positivos acercan) dentro de los límites 0.1–10"""
+        for _ in range(abs(steps)):
+            if steps > 0:
+                self.zoom_level = min(10.0, self.zoom_level * 1.5)
+            else:
+                self.zoom_level = max(0.1, self.zoom_level / 1.5)
         self._calculate_layout()
         self.update()
 
+    def zoom_in(self):
+        self._step_zoom(1)
+
+    def schedule_zoom(self, steps: int):
+        """Acumular pasos de zoom y aplicarlos juntos en la siguiente vuelta del bucle de eventos"""
+        self._pending_zoom += steps
+        if not self._zoom_scheduled:
+            self._zoom_scheduled = True
+            QTimer.singleShot(0, self._apply_zoom)
+
+    def _apply_zoom(self):
+        steps = self._pending_zoom
+        self._pending_zoom = 0
+        self._zoom_scheduled = False
+        if steps == 0:
+            return
+        self._step_zoom(steps)
+
     def zoom_out(self):
-        self.zoom_level = max(0.1, self.zoom_level / 1.5)
-        self._calculate_layout()
-        self.update()
+        self._step_zoom(-1)
+
+    def _scroll_area(self) -> Optional[QScrollArea]:
+        """QScrollArea que contiene el widget (su padre directo es el viewport)"""
+        parent = self.parent()
+        if parent is not None and not isinstance(parent, QScrollArea):
+            parent = parent.parent()
+        return parent if isinstance(parent, QScrollArea) else None
 
     def _get_visible_line_range(self):
         """Determinar qué líneas son visibles actualmente"""
-        scroll_area = self.parent()
-        if not isinstance(scroll_area, QScrollArea):
+        scroll_area = self._scroll_area()
+        if scroll_area is None:
             return 0, self.total_lines - 1
             
         scroll_y = scroll_area.verticalScrollBar().value()
@@ -477,36 +850,60 @@ class WaveformWidget(QWidget):
         
         return first_line, last_line
 
-    # En clase WaveformWidget arreglado:
-    def _load_line_data(self, line_idx: int):
-        """Cargar datos precalculados para una línea"""
-        if line_idx in self.line_cache:
-            return
-        if line_idx not in self.line_time_info:
-            return
-
-        if not self.audio_processor or not hasattr(self.audio_processor, "waveform_cache"):
-            return
-
-        mins, maxs = self.audio_processor.waveform_cache
-        if len(mins) == 0:
-            return
+    def _line_bounds(self, line_idx: int) -> Optional[Tuple[int, int]]:
+        """Inicio y fin (ms) de una línea, o None si no existe"""
+        if not 0 <= line_idx < len(self._line_starts):
+            return None
+        return int(self._line_starts[line_idx]), int(self._line_ends[line_idx])
+
+    def _line_cache_limit(self) -> int:
+        # El presupuesto sale de las líneas que caben en el viewport, no de la altura
+        # del widget, que dentro del QScrollArea es la del contenido completo
+        scroll_area = self._scroll_area()
+        height = scroll_area.viewport().height() if scroll_area is not None else self.height()
+        visible = height // (self.line_height + self.line_spacing) + 2
+        return max(2 * visible, 128)
+
+    def _get_line(self, line_idx: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Obtener el envelope de una línea, cargándolo desde la pirámide si hace falta"""
+        data = self.line_cache.get(line_idx)
+        if data is not None:
+            self.line_cache.move_to_end(line_idx)
+            return data
+        bounds = self._line_bounds(line_idx)
+        if bounds is None:
+            return None
+        if not self.audio_processor:
+            return None
 
         # Datos de tiempo de la línea
-        time_info = self.line_time_info[line_idx]
-        start_ms = time_info['start_ms']
-        end_ms = time_info['end_ms']
-        line_duration = end_ms - start_ms
-
-        # Índices en el array precalculado
-        points_per_ms = self.audio_processor.waveform_resolution / 1000.0
-        start_idx = int(start_ms * points_per_ms)
-        end_idx = int(end_ms * points_per_ms)
-
-        seg_mins = mins[start_idx:end_idx]
-        seg_maxs = maxs[start_idx:end_idx]
-
-        self.line_cache[line_idx] = (seg_mins, seg_maxs)
+        start_ms, end_ms = bounds
+        axis_width = max(1, self.width() - 100 - 10)
+        mins, maxs = self.audio_processor.get_envelope(start_ms, end_ms, axis_width)
+        if len(mins) == 0:
+            return None
+
+        # Se guardan en int16 (rango PCM nativo); el escalado se hace al dibujar
+        data = (mins, maxs)
+        self.line_cache[line_idx] = data
+        limit = self._line_cache_limit()
+        while len(self.line_cache) > limit:
+            self.line_cache.popitem(last=False)
+        return data
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # El nivel de la pirámide depende del ancho disponible
+        if event.oldSize().width() != event.size().width():
+            self.line_cache.clear()
+
+    @staticmethod
+    def _polyline(xs: np.ndarray, ys: np.ndarray) -> QPolygon:
+        """Construir un QPolygon en una sola llamada a partir de coordenadas NumPy"""
+        poly = QPolygon()
+        # setPoints de PyQt6 recibe las coordenadas como argumentos sueltos (x0, y0, x1, y1, ...)
+        poly.setPoints(*np.vstack((xs, ys)).T.ravel().tolist())
+        return poly
 
     def paintEvent(self, event):
         super().paintEvent(event)
@@ -518,26 +915,42 @@ class WaveformWidget(QWidget):
         
         # Configurar fuentes y colores
         painter.setFont(self.font())
-        pen_time = QPen(Qt.GlobalColor.black)
-        pen_axis = QPen(Qt.GlobalColor.gray)
-        pen_wave = QPen(Qt.GlobalColor.darkCyan)
-        pen_playhead = QPen(Qt.GlobalColor.red)
+        pen_time = self._pen_time
+        pen_axis = self._pen_axis
+        pen_wave = self._pen_wave
+        pen_playhead = self._pen_playhead
+        
+        # Geometría común a todas las líneas
+        axis_x = 100  # Posición X del eje
+        axis_width = max(1, self.width() - axis_x - 10)
+        # Escala de int16 a píxeles
+        amp = (self.line_height // 2 - 2) / 32768.0
+        xs_cache: Dict[int, np.ndarray] = {}
+        
+        # Línea y columna del playhead, calculadas una sola vez
+        playhead_px = self._playhead_to_px(self.playhead_ms)
         
         # Determinar qué líneas son visibles
         first_line, last_line = self._get_visible_line_range()
         
+        # Limitar a las líneas que cruzan el área a repintar
+        row_height = self.line_height + self.line_spacing
+        clip = event.rect()
+        first_line = max(first_line, clip.top() // row_height)
+        last_line = min(last_line, clip.bottom() // row_height)
+        
         # Dibujar solo las líneas visibles
         for line_idx in range(first_line, last_line + 1):
             if line_idx >= self.total_lines:
                 break
                 
             # Cargar datos para esta línea si no están en caché
-            self._load_line_data(line_idx)
+            line_data = self._get_line(line_idx)
             
             # Obtener información de tiempo para esta línea
-            time_info = self.line_time_info.get(line_idx, {})
-            start_time = time_info.get('start', '00:00')
-            end_time = time_info.get('end', '00:00')
+            line_start_ms, line_end_ms = self._line_bounds(line_idx)
+            start_time = fmt_ms(line_start_ms)
+            end_time = fmt_ms(line_end_ms)
             
             # Calcular posición Y de esta línea
             y = line_idx * (self.line_height + self.line_spacing)
@@ -550,52 +963,37 @@ class WaveformWidget(QWidget):
             
             # Dibujar eje central
             painter.setPen(pen_axis)
-            axis_x = 100  # Posición X del eje
-            axis_width = max(1, self.width() - axis_x - 10)
             painter.drawLine(axis_x, mid_y, axis_x + axis_width, mid_y)
             
             # Obtener datos de forma de onda para esta línea
-            if line_idx in self.line_cache:
-                mins, maxs = self.line_cache[line_idx]
+            if line_data is None and self.loading:
+                painter.setPen(pen_time)
+                painter.drawText(axis_x + 10, mid_y - 4, "Cargando forma de onda…")
+            elif line_data is not None:
+                mins, maxs = line_data
                 if len(mins) > 0 and len(maxs) > 0:
-                    # Dibujar forma de onda usando QPainterPath para mejor rendimiento
+                    # Dibujar forma de onda como polilíneas calculadas con NumPy
                     painter.setPen(pen_wave)
                     
-                    path_min = QPainterPath()
-                    path_max = QPainterPath()
+                    # Las X solo dependen del número de puntos: se reutilizan entre líneas
+                    n = len(mins)
+                    xs = xs_cache.get(n)
+                    if xs is None:
+                        x_scale = axis_width / n
+                        xs = axis_x + (np.arange(n) * x_scale).astype(np.int32)
+                        xs_cache[n] = xs
                     
-                    # Calcular el factor de escala para ajustar al ancho disponible
-                    x_scale = axis_width / max(1, len(mins))
-                    
-                    for i in range(len(mins)):
-                        x = axis_x + int(i * x_scale)
-                        y_min = mid_y - int(mins[i] * (self.line_height // 2 - 2))
-                        y_max = mid_y - int(maxs[i] * (self.line_height // 2 - 2))
-                        
-                        if i == 0:
-                            path_min.moveTo(x, y_min)
-                            path_max.moveTo(x, y_max)
-                        else:
-                            path_min.lineTo(x, y_min)
-                            path_max.lineTo(x, y_max)
+                    # Ambas curvas se escalan en una sola operación vectorizada
+                    ys = mid_y - (np.vstack((mins, maxs)) * amp).astype(np.int32)
                     
-                    painter.drawPath(path_min)
-                    painter.drawPath(path_max)
+                    painter.drawPolyline(self._polyline(xs, ys[0]))
+                    painter.drawPolyline(self._polyline(xs, ys[1]))
             
             # Dibujar playhead si está en esta línea
-            if line_idx in self.line_time_info:
-                line_start_ms = self.line_time_info[line_idx]['start_ms']
-                line_end_ms = self.line_time_info[line_idx]['end_ms']
-                
-                if line_start_ms <= self.playhead_ms <= line_end_ms:
-                    # Calcular posición X del playhead dentro de esta línea
-                    line_duration = line_end_ms - line_start_ms
-                    if line_duration > 0:
-                        position_in_line = (self.playhead_ms - line_start_ms) / line_duration
-                        playhead_x = axis_x + int(position_in_line * axis_width)
-                        
-                        painter.setPen(pen_playhead)
-                        painter.drawLine(playhead_x, y, playhead_x, y + self.line_height)
+            if playhead_px is not None and line_idx == playhead_px[0]:
+                playhead_x = playhead_px[1]
+                painter.setPen(pen_playhead)
+                painter.drawLine(playhead_x, y, playhead_x, y + self.line_height)
                         
     # Añadido arreglo a WaveformWidget:
     def mousePressEvent(self, event):
@@ -604,12 +1002,11 @@ class WaveformWidget(QWidget):
         
         # Línea clicada
         line_idx = event.pos().y() // (self.line_height + self.line_spacing)
-        if line_idx not in self.line_time_info:
+        bounds = self._line_bounds(line_idx)
+        if bounds is None:
             return
     
-        time_info = self.line_time_info[line_idx]
-        line_start = time_info['start_ms']
-        line_end = time_info['end_ms']
+        line_start, line_end = bounds
         line_duration = line_end - line_start
     
         axis_x = 100
@@ -619,33 +1016,81 @@ class WaveformWidget(QWidget):
         position_in_line = rel_x / axis_width
         ms = line_start + int(position_in_line * line_duration)
     
-        self.audio_processor.set_position_ms(ms)
+        if self._seek_handler:
+            self._seek_handler(ms)
+        else:
+            self.audio_processor.set_position_ms(ms)
 
 # Ventana principal de la aplicación
 class AudioPlayer(QMainWindow):
-    def __init__(self):
+    def __init__(self, defer: bool = False):
+        """
+        Con defer=True solo se construye la interfaz; el motor de audio y las señales
+        se inicializan en _post_show_init() tras la primera vuelta del bucle de eventos,
+        de modo que la ventana se pinta antes.
+        """
         super().__init__()
         self.setWindowTitle("Audinux - Reproductor de Audio")
         self.resize(1200, 700)
 
-        # Inicializar componentes primero
-        self.audio = AudioProcessor()
+        # Inicializar componentes ligeros primero; el motor de audio va en _post_show_init
+        self.audio: Optional[AudioProcessor] = None
         self.markers = MarkersManager()
         self.playlist = Playlist()
         self.settings = AppSettings()
+        self._wave_builder: Optional[WaveformBuilder] = None
+        self._wave_generation = 0
+        # Índice del último marcador visitado con ./, (se descarta al buscar por otra vía)
+        self._marker_cursor: Optional[int] = None
         
         # Inicializar variables de estado antes de construir la UI
-        self.current_rate = self.settings.last_rate()
+        # La velocidad se guarda en centésimas (100 = 1.0x); current_rate es solo la vista float
+        self.current_rate_centi = max(25, min(400, int(round(self.settings.last_rate() * 100))))
+        self.current_rate = self.current_rate_centi / 100.0
         self.current_volume = 70  # Volumen inicial
         
         # Ahora construir la UI
         self._build_ui()
-        self._connect_signals()
+        self._build_keymap()
 
         # Configurar temporizador
         self.timer = QTimer(self)
         self.timer.setInterval(200)  # Reducir frecuencia de actualización
         self.timer.timeout.connect(self._on_tick)
+        
+        # Agrupar los cambios de velocidad de Ctrl+↑/↓ con autorepetición
+        self._rate_pending: Optional[int] = None
+        self._rate_timer = QTimer(self)
+        self._rate_timer.setSingleShot(True)
+        self._rate_timer.setInterval(40)
+        self._rate_timer.timeout.connect(self._flush_rate)
+        
+        # Agrupar las búsquedas de ←/→ mantenidas: como mucho una cada 16 ms
+        self._scrub_target_ms: Optional[int] = None
+        self._scrub_timer = QTimer(self)
+        self._scrub_timer.setSingleShot(True)
+        self._scrub_timer.setInterval(16)
+        self._scrub_timer.timeout.connect(self._flush_scrub)
+        # Último destino enviado a VLC: sirve de base a la siguiente pulsación de la
+        # ráfaga hasta que VLC informe de la nueva posición o pase la ventana
+        self._scrub_base_ms: Optional[int] = None
+        self._scrub_burst_timer = QTimer(self)
+        self._scrub_burst_timer.setSingleShot(True)
+        self._scrub_burst_timer.setInterval(250)
+        self._scrub_burst_timer.timeout.connect(self._end_scrub_burst)
+        
+        if defer:
+            QTimer.singleShot(0, self._post_show_init)
+        else:
+            self._post_show_init()
+
+    def _post_show_init(self):
+        """Parte costosa de la inicialización: motor VLC, señales y temporizador"""
+        self.audio = AudioProcessor()
+        # Método ligado una sola vez para las rutas de búsqueda (←/→ y _seek_absolute)
+        self._seek_ms = self.audio.set_position_ms
+        self.wave.set_audio_processor(self.audio)
+        self._connect_signals()
         self.timer.start()
         
         # Aplicar configuración inicial
@@ -671,7 +1116,7 @@ class AudioPlayer(QMainWindow):
         self.lbl_rate = QLabel("Velocidad: 1.00x")
         self.sld_rate = QSlider(Qt.Orientation.Horizontal)
         self.sld_rate.setRange(25, 400)
-        self.sld_rate.setValue(int(self.current_rate * 100))
+        self.sld_rate.setValue(self.current_rate_centi)
         self.sld_rate.setSingleStep(5)
         tb.addWidget(self.lbl_rate)
         tb.addWidget(self.sld_rate)
@@ -704,7 +1149,6 @@ class AudioPlayer(QMainWindow):
         left_layout.addLayout(zoom_bar)
 
         self.wave = WaveformWidget()
-        self.wave.set_audio_processor(self.audio)
         scroll = QScrollArea()
         scroll.setWidgetResizable(True)
         scroll.setWidget(self.wave)
@@ -765,6 +1209,7 @@ class AudioPlayer(QMainWindow):
         self.lst_markers.itemDoubleClicked.connect(self._jump_to_marker)
         self.btn_loop.clicked.connect(self._toggle_loop)
         self.wave.set_position_provider(self._current_ms)
+        self.wave.set_seek_handler(self._seek_absolute)
 
     def _open_file(self):
         start_dir = self.settings.last_dir() or os.path.expanduser('~')
@@ -778,9 +1223,16 @@ class AudioPlayer(QMainWindow):
         self._load_path(path, add_to_playlist=True)
 
     def _load_path(self, path: str, add_to_playlist: bool = False):
+        # El archivo ya está abierto: no repetir ffprobe, caché PCM ni pirámide
+        if path == self.audio.audio_path and self.audio.is_ready:
+            if add_to_playlist:
+                self.playlist.add(path)
+                self._refresh_playlist()
+            self._seek_absolute(0)
+            self._update_time_label()
+            return
         try:
             self.audio.load_audio(path)
-            self.audio.precompute_waveform(resolution_per_second=50)
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo cargar el archivo:\n{e}")
             return
@@ -790,15 +1242,39 @@ class AudioPlayer(QMainWindow):
         self.markers.load_for(path)
         self._refresh_markers()
         
-        # Configurar el widget de waveform
+        # Configurar el widget de waveform; la pirámide se prepara en segundo plano
         self.wave.set_audio_processor(self.audio)
+        self._start_waveform_build(path)
         
-        self.audio.set_position_ms(0)
+        self._seek_absolute(0)
         self._apply_rate()
         self._apply_volume()
         self._update_time_label()
         self.setWindowTitle(f"Audinux — {os.path.basename(path)}")
 
+    def _start_waveform_build(self, path: str):
+        self.wave.set_loading(True)
+        # La construcción anterior ya no se va a mostrar: no seguir transcodificando
+        if self._wave_builder is not None:
+            self._wave_builder.cancel()
+        self._wave_generation += 1
+        builder = WaveformBuilder(self.audio, path, self._wave_generation)
+        builder.signals.finished.connect(self._on_waveform_ready)
+        # Mantener una referencia hasta que llegue la señal
+        self._wave_builder = builder
+        QThreadPool.globalInstance().start(builder)
+
+    def _on_waveform_ready(self, result):
+        generation, path, pyramid = result
+        # Ignorar resultados de construcciones sustituidas por otra más reciente
+        if generation != self._wave_generation or path != self.audio.audio_path:
+            return
+        self._wave_builder = None
+        # Un fallo no borra una pirámide ya cargada del mismo archivo
+        if pyramid or not self.audio.pyramid:
+            self.audio.set_waveform_data(pyramid)
+        self.wave.set_loading(False)
+
     def _toggle_play(self):
         if self.audio.is_playing():
             self.audio.pause()
@@ -809,7 +1285,8 @@ class AudioPlayer(QMainWindow):
         self.audio.stop()
 
     def _on_rate_changed(self, value: int):
-        self.current_rate = round(value / 100.0, 2)
+        self.current_rate_centi = value
+        self.current_rate = value / 100.0
         self._apply_rate()
 
     def _apply_rate(self):
@@ -860,6 +1337,7 @@ class AudioPlayer(QMainWindow):
         self.ed_marker.clear()
 
     def _refresh_markers(self, select_last=False):
+        self._marker_cursor = None
         self.lst_markers.clear()
         for m in self.markers.list():
             item = QListWidgetItem(f"{m.name} — {fmt_ms(m.ms)}")
@@ -870,7 +1348,8 @@ class AudioPlayer(QMainWindow):
 
     def _jump_to_marker(self, item):
         ms = int(item.data(Qt.ItemDataRole.UserRole))
-        self.audio.set_position_ms(ms)
+        self._marker_cursor = None
+        self._seek_absolute(ms)
 
     def _toggle_loop(self):
         items = self.lst_markers.selectedItems()
@@ -888,104 +1367,188 @@ class AudioPlayer(QMainWindow):
             self.btn_loop.setText("Loop A↔B (L)")
 
     def _on_tick(self):
-        jump_to = self.markers.should_loop(self._current_ms())
+        # Una sola lectura de posición por tick para el loop y la etiqueta
+        cur = self._current_ms()
+        jump_to = self.markers.should_loop(cur)
         if jump_to is not None:
-            self.audio.set_position_ms(jump_to)
-        self._update_time_label()
+            self._seek_absolute(jump_to)
+            cur = jump_to
+        self._update_time_label(cur)
 
-    def _update_time_label(self):
-        cur = self._current_ms()
+    def _update_time_label(self, cur: Optional[int] = None):
+        if cur is None:
+            cur = self._current_ms()
         tot = self.audio.duration_ms
         self.lbl_time.setText(f"{fmt_ms(cur)} / {fmt_ms(tot)}")
 
     def _current_ms(self) -> int:
         return self.audio.position_ms()
 
-    def keyPressEvent(self, e):
-        key = e.key()
-        mod = e.modifiers()
+    def closeEvent(self, e):
+        self.markers.flush()
+        # El QThreadPool global se espera al salir: cortar ffmpeg para no colgar el cierre
+        if self._wave_builder is not None:
+            self._wave_builder.cancel()
+        super().closeEvent(e)
+
+    def _build_keymap(self):
+        """Precalcular la tabla de atajos: (tecla, modificadores) -> acción"""
+        # Todas las combinaciones de Ctrl/Shift/Alt, y las que incluyen Ctrl
+        any_mod = [0]
+        for bit in (_CTRL, _SHIFT, _ALT):
+            any_mod += [m | bit for m in any_mod]
+        with_ctrl = [m for m in any_mod if m & _CTRL]
         
-        if key == Qt.Key.Key_Space:
-            self._toggle_play()
-            e.accept()
-            return
-        if key == Qt.Key.Key_S:
-            self._stop()
-            e.accept()
-            return
-        if key in (Qt.Key.Key_Plus, Qt.Key.Key_Equal, Qt.Key.Key_Z):
-            self.wave.zoom_in()
-            e.accept()
-            return
-        if key in (Qt.Key.Key_Minus, Qt.Key.Key_Underscore, Qt.Key.Key_X):
-            self.wave.zoom_out()
-            e.accept()
-            return
-        if key == Qt.Key.Key_M:
-            self._add_marker()
-            e.accept()
-            return
-        if key == Qt.Key.Key_L:
-            self._toggle_loop()
-            e.accept()
-            return
-        if key == Qt.Key.Key_Period:
-            nxt = self._next_marker_after(self._current_ms())
-            if nxt: self.audio.set_position_ms(nxt.ms)
-            e.accept()
-            return
-        if key == Qt.Key.Key_Comma:
-            prv = self._prev_marker_before(self._current_ms())
-            if prv: self.audio.set_position_ms(prv.ms)
-            e.accept()
-            return
-        if key in (Qt.Key.Key_Left, Qt.Key.Key_Right):
-            delta = 5000
-            if mod & Qt.KeyboardModifier.ControlModifier:
-                delta = 30000
-            elif mod & Qt.KeyboardModifier.ShiftModifier:
-                delta = 1000
-            if key == Qt.Key.Key_Left:
-                self.audio.set_position_ms(max(0, self._current_ms() - delta))
-            else:
-                self.audio.set_position_ms(self._current_ms() + delta)
-            e.accept()
-            return
-        if key == Qt.Key.Key_O and (mod & Qt.KeyboardModifier.ControlModifier):
-            self._open_file()
-            e.accept()
-            return
-        if key == Qt.Key.Key_P and (mod & Qt.KeyboardModifier.ControlModifier):
-            self._add_to_playlist()
-            e.accept()
-            return
-        if key == Qt.Key.Key_Up and (mod & Qt.KeyboardModifier.ControlModifier):
-            self._nudge_rate(+0.05)
-            e.accept()
+        bindings = [
+            ((_K_SPACE,), any_mod, self._toggle_play),
+            ((_K_S,), any_mod, self._stop),
+            ((_K_PLUS, _K_EQUAL, _K_Z, _K_ZOOM_IN), any_mod, partial(self.wave.schedule_zoom, +1)),
+            ((_K_MINUS, _K_UNDERSCORE, _K_X, _K_ZOOM_OUT), any_mod, partial(self.wave.schedule_zoom, -1)),
+            ((_K_M,), any_mod, self._add_marker),
+            ((_K_L,), any_mod, self._toggle_loop),
+            ((_K_PERIOD,), any_mod, self._goto_next_marker),
+            ((_K_COMMA,), any_mod, self._goto_prev_marker),
+            ((_K_O,), with_ctrl, self._open_file),
+            ((_K_P,), with_ctrl, self._add_to_playlist),
+            ((_K_UP,), with_ctrl, partial(self._nudge_rate, +5)),
+            ((_K_DOWN,), with_ctrl, partial(self._nudge_rate, -5)),
+        ]
+        self._keymap = {
+            (key, mod): handler
+            for keys, mods, handler in bindings
+            for key in keys
+            for mod in mods
+        }
+        
+        # Acciones ya resueltas por código nativo de tecla + modificadores (ver keyPressEvent)
+        self._native_cache: Dict[int, Callable[[], None]] = {}
+        
+        # Desplazamientos de ←/→ según modificador
+        self._seekmap = {}
+        for mod in any_mod:
+            delta = _SEEK_DELTAS[(1 if mod & _CTRL else 0) | (2 if mod & _SHIFT else 0)]
+            self._seekmap[(_K_LEFT, mod)] = -delta
+            self._seekmap[(_K_RIGHT, mod)] = delta
+
+    def keyPressEvent(self, e):
+        """
+        Cada accesor del evento se consulta una sola vez al principio y el resto
+        del método trabaja con enteros locales; e.key() solo se lee si la
+        combinación no está todavía en la caché nativa.
+        """
+        # Los atajos no están activos hasta terminar _post_show_init
+        if self.audio is None:
+            super().keyPressEvent(e)
             return
-        if key == Qt.Key.Key_Down and (mod & Qt.KeyboardModifier.ControlModifier):
-            self._nudge_rate(-0.05)
-            e.accept()
+        raw_mod = e.modifiers().value
+        native_key = e.nativeVirtualKey()
+        
+        # Vía rápida: combinación ya vista, indexada por el código nativo de la tecla
+        native_id = native_key | (raw_mod << 32)
+        handler = self._native_cache.get(native_id)
+        if handler is None:
+            key = int(e.key())
+            handler = self._resolve_shortcut(key, raw_mod & _MOD_MASK)
+            if handler is None:
+                # Tecla nuestra con otros modificadores (p. ej. O sin Ctrl): ningún
+                # atajo por defecto de Qt aplica, así que no se recorre la cadena de foco
+                if key in _HANDLED_KEYS:
+                    e.ignore()
+                    return
+                super().keyPressEvent(e)
+                return
+            # Algunas plataformas no informan del código nativo (0): no se cachea
+            if native_key:
+                self._native_cache[native_id] = handler
+        handler()
+        e.accept()
+
+    def _resolve_shortcut(self, key: int, mod: int) -> Optional[Callable[[], None]]:
+        """Buscar la acción de una tecla con sus modificadores ya enmascarados"""
+        handler = self._keymap.get((key, mod))
+        if handler is not None:
+            return handler
+        delta = self._seekmap.get((key, mod))
+        if delta is not None:
+            return partial(self._seek_relative, delta)
+        return None
+
+    def _seek_relative(self, delta: int):
+        self._marker_cursor = None
+        # Durante una ráfaga se acumula sobre el destino pendiente, no sobre VLC
+        cur = self._scrub_target_ms
+        if cur is None:
+            cur = self._current_ms()
+            base = self._scrub_base_ms
+            # Si VLC aún no ha aplicado la última búsqueda, su posición es la de antes:
+            # solo se acepta si ya está en [base, base + ventana)
+            if base is not None and not 0 <= cur - base < self._scrub_burst_timer.interval():
+                cur = base
+        target = max(0, cur + delta)
+        self._scrub_target_ms = target
+        self._scrub_base_ms = target
+        self._scrub_burst_timer.start()
+        # El cursor se mueve al instante; la búsqueda real se aplaza
+        self.wave.set_playhead_ms(target)
+        if not self._scrub_timer.isActive():
+            self._scrub_timer.start()
+
+    def _flush_scrub(self):
+        if self._scrub_target_ms is None:
             return
-        super().keyPressEvent(e)
+        target = self._scrub_target_ms
+        self._scrub_target_ms = None
+        self._seek_ms(target)
+
+    def _end_scrub_burst(self):
+        self._scrub_base_ms = None
+
+    def _seek_absolute(self, ms: int):
+        """Búsqueda que no viene de ←/→: descarta la ráfaga en curso para que no la deshaga"""
+        self._scrub_timer.stop()
+        self._scrub_burst_timer.stop()
+        self._scrub_target_ms = None
+        self._scrub_base_ms = None
+        self._seek_ms(ms)
+
+    def _goto_next_marker(self):
+        # Al recorrer marcadores en orden, el siguiente al último visitado suele ser la respuesta
+        hint = None if self._marker_cursor is None else self._marker_cursor + 1
+        i = self.markers.index_after(self._current_ms(), hint)
+        if i is not None:
+            self._marker_cursor = i
+            self._seek_absolute(self.markers.ms_at(i))
+
+    def _goto_prev_marker(self):
+        # Tras saltar a un marcador y seguir reproduciendo, el anterior suele ser ese mismo
+        hint = self._marker_cursor
+        i = self.markers.index_before(self._current_ms(), hint)
+        if i is not None:
+            self._marker_cursor = i
+            self._seek_absolute(self.markers.ms_at(i))
+
+    def _nudge_rate(self, delta_centi: int):
+        # Partir del valor pendiente para que las pulsaciones seguidas se acumulen
+        if self._rate_pending is not None:
+            current = self._rate_pending
+        else:
+            current = self.current_rate_centi
+        self._rate_pending = max(25, min(400, current + delta_centi))
+        self._rate_timer.start()
 
-    def _nudge_rate(self, delta: float):
-        v = int(round((self.current_rate + delta) * 100))
-        v = max(25, min(400, v))
+    def _flush_rate(self):
+        if self._rate_pending is None:
+            return
+        v = self._rate_pending
+        self._rate_pending = None
         self.sld_rate.setValue(v)
 
-    def _next_marker_after(self, ms: int) -> Optional[Marker]:
-        return self.markers.nearest_after(ms)
-
-    def _prev_marker_before(self, ms: int) -> Optional[Marker]:
-        return self.markers.nearest_before(ms)
-
 # Función principal
 def main():
     app = QApplication(sys.argv)
-    player = AudioPlayer()
+    player = AudioPlayer(defer=True)
     player.show()
-    sys.exit(app.exec())
+    raise SystemExit(app.exec())
 
 if __name__ == '__main__':
     main()